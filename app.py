@@ -1,14 +1,26 @@
 # --- ETAPA 1: IMPORTAR BIBLIOTECAS ---
+import hashlib
+import io
+import logging
+import os
+import threading
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+ARQUIVO_DADOS = "Importação e Exportação - 19-25.xlsx"
+
+logger = logging.getLogger(__name__)
+
 # --- ETAPA 2: CARREGAR OS DADOS BRUTOS ---
-@st.cache_data
-def carregar_dados():
-    df = pd.read_excel("Importação e Exportação - 19-25.xlsx")
+# A versão é o hash do conteúdo da planilha: a tabela publicada e todos os caches
+# derivados usam essa versão como chave, então trocar o arquivo invalida os
+# resultados sem reiniciar.
+def carregar_dados(conteudo):
+    """Monta a tabela a partir dos bytes da planilha (os mesmos que geram a versão)"""
+    df = pd.read_excel(io.BytesIO(conteudo))
     # Renomear colunas fixas
     df = df.rename(columns={
         "Países": "Pais",
@@ -47,6 +59,87 @@ def carregar_dados():
     
     return df_final
 
+def somar_por_grupo(df, group_cols, colunas_valor, filtros):
+    """Aplica os filtros (pares coluna/valor) e soma as colunas de valor por grupo"""
+    for coluna, valor in filtros:
+        df = df[df[coluna] == valor]
+    return df.groupby(list(group_cols), as_index=False)[list(colunas_valor)].sum()
+
+@st.cache_data(max_entries=500, ttl=3600)
+def agregar_dados(versao, anos, sh4s, group_cols, colunas_valor, filtros, _df):
+    """somar_por_grupo em cache por versão dos dados, filtros da sidebar e agrupamento"""
+    return somar_por_grupo(_df, group_cols, colunas_valor, filtros)
+
+# --- VERSÃO DOS DADOS ---
+@st.cache_resource
+def estado_versao():
+    """Tabela publicada e sua versão, compartilhadas por todas as sessões do processo"""
+    return {"lock": threading.Lock(), "assinatura": None, "publicado": (None, None)}
+
+def recarregar_se_mudou(estado):
+    """Relê a planilha se mtime/tamanho mudaram e troca o par publicado.
+
+    Deve ser chamada com estado["lock"] adquirido. A troca só acontece depois que
+    a nova tabela foi montada sem erro.
+    """
+    info = os.stat(ARQUIVO_DADOS)
+    assinatura = (info.st_mtime_ns, info.st_size)
+    if assinatura == estado["assinatura"]:
+        return
+    with open(ARQUIVO_DADOS, "rb") as arquivo:
+        conteudo = arquivo.read()
+    nova_versao = hashlib.sha256(conteudo).hexdigest()[:16]
+    versao_antiga = estado["publicado"][0]
+    if nova_versao != versao_antiga:
+        estado["publicado"] = (nova_versao, carregar_dados(conteudo))
+        if versao_antiga is not None:
+            agregar_dados.clear()
+    estado["assinatura"] = assinatura
+
+def dados_publicados():
+    """Verifica a planilha a cada execução e publica uma nova versão se ela mudou.
+
+    Retorna (versao, tabela) como um único par, então a tabela sempre corresponde
+    à versão. O stat é barato; os bytes só são relidos quando mtime/tamanho mudam,
+    e a versão é o hash desses mesmos bytes. Só uma thread recarrega: as demais
+    seguem com o par anterior até a troca. Se a planilha estiver ausente ou
+    incompleta (troca em andamento), o par anterior continua sendo servido e a
+    leitura é tentada de novo na próxima execução.
+    """
+    estado = estado_versao()
+    try:
+        info = os.stat(ARQUIVO_DADOS)
+        if (info.st_mtime_ns, info.st_size) == estado["assinatura"]:
+            return estado["publicado"]
+    except OSError:
+        if estado["publicado"][0] is None:
+            raise
+        logger.warning("Planilha indisponível, mantendo a versão %s", estado["publicado"][0])
+        return estado["publicado"]
+
+    # Sem nada publicado ainda, todas as sessões precisam esperar a primeira carga
+    if estado["publicado"][0] is None:
+        with estado["lock"]:
+            recarregar_se_mudou(estado)
+        return estado["publicado"]
+
+    if not estado["lock"].acquire(blocking=False):
+        return estado["publicado"]
+    try:
+        recarregar_se_mudou(estado)
+    except Exception:
+        # OSError ou erro de leitura do xlsx (arquivo ainda sendo escrito)
+        logger.warning(
+            "Falha ao recarregar a planilha, mantendo a versão %s",
+            estado["publicado"][0], exc_info=True
+        )
+    finally:
+        estado["lock"].release()
+    return estado["publicado"]
+
+def versao_publicada():
+    return estado_versao()["publicado"][0]
+
 # --- FUNÇÃO PARA FORMATAR NÚMEROS ---
 def formatar_numero(valor):
     if pd.isna(valor) or valor == 0:
@@ -86,7 +179,7 @@ st.set_page_config(page_title="Dashboard Comércio Exterior", layout="wide")
 st.title("📊 Dashboard de Importação e Exportação")
 
 # Carregar dados
-df_final = carregar_dados()
+versao_dados, df_final = dados_publicados()
 
 # --- CONSTANTES ---
 ordem_vias = [
@@ -133,18 +226,33 @@ sh4_selecionados = st.sidebar.multiselect(
 )
 
 # Aplicar filtros
-if anos_selecionados:
-    df_final = df_final[df_final["Ano"].isin(anos_selecionados)].copy()
-else:
+if not anos_selecionados:
     st.sidebar.error("Selecione pelo menos um ano!")
     st.stop()
 
-if sh4_selecionados:
-    df_final = df_final[df_final["SH4"].isin(sh4_selecionados)].copy()
-else:
+if not sh4_selecionados:
     st.sidebar.error("Selecione pelo menos um produto SH4!")
     st.stop()
 
+anos_chave = tuple(sorted(int(ano) for ano in anos_selecionados))
+sh4_chave = tuple(sorted(int(sh4) for sh4 in sh4_selecionados))
+df_final = df_final[df_final["Ano"].isin(anos_chave) & df_final["SH4"].isin(sh4_chave)]
+
+def agregar(group_cols, colunas_valor, filtros=()):
+    """Agregação do recorte atual, em cache pela versão dos dados.
+
+    Se a planilha já foi trocada durante esta execução, calcula sem cache para
+    evitar repovoar agregar_dados com a versão antiga. É só um esforço: uma troca
+    entre a checagem e a chamada ainda pode gravar entradas antigas, que
+    max_entries/ttl acabam descartando e a nova versão nunca consulta.
+    """
+    if versao_dados != versao_publicada():
+        return somar_por_grupo(df_final, group_cols, colunas_valor, filtros)
+    return agregar_dados(
+        versao_dados, anos_chave, sh4_chave,
+        tuple(group_cols), tuple(colunas_valor), tuple(filtros), df_final
+    )
+
 # --- PÁGINA 1: TOPS INTERATIVOS ---
 if pagina == "📋 Tops Interativos":
     st.header("📋 Tops Interativos")
@@ -186,13 +294,13 @@ if pagina == "📋 Tops Interativos":
         )
     
     # Função para mostrar tops
-    def mostrar_top_interativo(df, group_cols, tipos_fluxo, titulo, topn=5, filtro_adicional=None, ano_especifico=None):
+    def mostrar_top_interativo(group_cols, tipos_fluxo, titulo, topn=5, filtro_adicional=(), ano_especifico=None):
         if ano_especifico and ano_especifico != "Todos":
             # Mostrar apenas o ano selecionado
             anos = [ano_especifico]
         else:
             # Mostrar todos os anos
-            anos = sorted(df["Ano"].unique())
+            anos = sorted(df_final["Ano"].unique())
         
         # Se "Ambos" foi selecionado, mostrar Exportação e depois Importação separadamente
         if "Ambos" in tipos_fluxo:
@@ -205,20 +313,13 @@ if pagina == "📋 Tops Interativos":
                 st.subheader(f"📊 {tipo_fluxo}")
             
             for ano in anos:
-                df_ano = df[df["Ano"] == ano].copy()
-                
-                # Aplicar filtro adicional se necessário
-                if filtro_adicional:
-                    df_ano = filtro_adicional(df_ano)
-                
-                # Filtrar por tipo de fluxo específico
-                df_ano = df_ano[df_ano["Tipo"] == tipo_fluxo]
+                # Filtro adicional (pares coluna/valor) + ano + tipo de fluxo
+                filtros = (("Ano", int(ano)), ("Tipo", tipo_fluxo)) + tuple(filtro_adicional)
+                tabela_ano = agregar(group_cols, ["Valor_FOB", "Quilo_Liquido"], filtros)
                 
-                if not df_ano.empty:
+                if not tabela_ano.empty:
                     tabela = (
-                        df_ano.groupby(group_cols, as_index=False)
-                        [["Valor_FOB", "Quilo_Liquido"]]
-                        .sum()
+                        tabela_ano
                         .sort_values("Valor_FOB", ascending=False)
                         .head(topn)
                     )
@@ -254,19 +355,19 @@ if pagina == "📋 Tops Interativos":
     tipos_selecionados = [fluxo_tipo] if fluxo_tipo != "Ambos" else ["Ambos"]
     
     if tipo_analise == "🌍 Global":
-        mostrar_top_interativo(df_final, ["Pais"], tipos_selecionados, "Top Global", top_n, ano_especifico=ano_selecionado_tops)
+        mostrar_top_interativo(["Pais"], tipos_selecionados, "Top Global", top_n, ano_especifico=ano_selecionado_tops)
     
     elif tipo_analise == "🚢 Por Via":
-        filtro_via = lambda df: df[df["Via"] == via_selecionada]
+        filtro_via = (("Via", via_selecionada),)
         mostrar_top_interativo(
-            df_final, ["Pais"], tipos_selecionados, 
+            ["Pais"], tipos_selecionados, 
             f"Via {via_selecionada}", top_n, filtro_via, ano_especifico=ano_selecionado_tops
         )
     
     elif tipo_analise == "📦 Por Produto":
-        filtro_produto = lambda df: df[df["SH4"] == sh4_selecionado]
+        filtro_produto = (("SH4", sh4_selecionado),)
         mostrar_top_interativo(
-            df_final, ["Pais"], tipos_selecionados,
+            ["Pais"], tipos_selecionados,
             f"{sh4_selecionado} - {mapa_sh4[sh4_selecionado]}", top_n, filtro_produto, ano_especifico=ano_selecionado_tops
         )
 
@@ -279,12 +380,10 @@ elif pagina == "🔍 Análise Detalhada por País":
     pais_selecionado = st.selectbox("Selecione o País:", paises_disponiveis)
     
     if pais_selecionado:
-        df_pais = df_final[df_final["Pais"] == pais_selecionado].copy()
-        
         # ========== RESUMO GERAL DO PAÍS ==========
         st.subheader(f"📊 Resumo Geral - {pais_selecionado}")
         
-        resumo_pais = df_pais.groupby(["Ano", "Tipo"], as_index=False)["Valor_FOB"].sum()
+        resumo_pais = agregar(["Ano", "Tipo"], ["Valor_FOB"], [("Pais", pais_selecionado)])
         
         col1, col2 = st.columns(2)
         
@@ -330,22 +429,20 @@ elif pagina == "🔍 Análise Detalhada por País":
         
         with col3:
             if modo_analise_produto == "Ano Específico":
-                anos_pais = sorted(df_pais["Ano"].unique(), reverse=True)
+                anos_pais = sorted(resumo_pais["Ano"].unique(), reverse=True)
                 ano_selecionado = st.selectbox(
                     "Selecione o Ano:",
                     anos_pais,
                     key="ano_produto"
                 )
         
-        df_produtos_pais = df_pais[df_pais["Tipo"] == tipo_fluxo_pais].copy()
+        # Resumo por produto e ano
+        resumo_produtos = agregar(
+            ["SH4", "Descricao", "Ano"], ["Valor_FOB", "Quilo_Liquido"],
+            [("Pais", pais_selecionado), ("Tipo", tipo_fluxo_pais)]
+        )
         
-        if not df_produtos_pais.empty:
-            # Resumo por produto e ano
-            resumo_produtos = (
-                df_produtos_pais.groupby(["SH4", "Descricao", "Ano"], as_index=False)
-                [["Valor_FOB", "Quilo_Liquido"]].sum()
-            )
-            
+        if not resumo_produtos.empty:
             if modo_analise_produto == "Ano Específico":
                 # TODOS os produtos no ano selecionado (não apenas top 10)
                 produtos_ano = (
@@ -444,20 +541,17 @@ elif pagina == "🔍 Análise Detalhada por País":
                 key="modo_analise_via"
             )
         
-        # Filtrar dados por tipo de fluxo
-        df_vias_pais = df_pais[df_pais["Tipo"] == tipo_fluxo_via].copy()
+        # Resumo por via e ano do tipo de fluxo selecionado
+        resumo_vias_tempo = agregar(
+            ["Via", "Ano"], ["Valor_FOB", "Quilo_Liquido"],
+            [("Pais", pais_selecionado), ("Tipo", tipo_fluxo_via)]
+        )
         
-        if not df_vias_pais.empty:
+        if not resumo_vias_tempo.empty:
             
             if modo_analise_via == "Evolução Temporal":
                 st.write(f"**Evolução das Vias de Transporte - {tipo_fluxo_via}:**")
                 
-                # Resumo por via e ano
-                resumo_vias_tempo = (
-                    df_vias_pais.groupby(["Via", "Ano"], as_index=False)
-                    [["Valor_FOB", "Quilo_Liquido"]].sum()
-                )
-                
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -502,7 +596,7 @@ elif pagina == "🔍 Análise Detalhada por País":
                 
                 with col1:
                     # Seletor de via
-                    vias_disponiveis = sorted(df_vias_pais["Via"].unique())
+                    vias_disponiveis = sorted(resumo_vias_tempo["Via"].unique())
                     via_selecionada = st.selectbox(
                         "Selecione a Via:",
                         vias_disponiveis,
@@ -511,7 +605,7 @@ elif pagina == "🔍 Análise Detalhada por País":
                 
                 with col2:
                     # Seletor de ano
-                    anos_vias = sorted(df_vias_pais["Ano"].unique(), reverse=True)
+                    anos_vias = sorted(resumo_vias_tempo["Ano"].unique(), reverse=True)
                     ano_via = st.selectbox(
                         "Selecione o Ano:",
                         anos_vias,
@@ -519,17 +613,13 @@ elif pagina == "🔍 Análise Detalhada por País":
                     )
                 
                 # Análise da composição
-                df_composicao = df_vias_pais[
-                    (df_vias_pais["Via"] == via_selecionada) & 
-                    (df_vias_pais["Ano"] == ano_via)
-                ].copy()
+                composicao_produtos = agregar(
+                    ["SH4", "Descricao"], ["Valor_FOB", "Quilo_Liquido"],
+                    [("Pais", pais_selecionado), ("Tipo", tipo_fluxo_via),
+                     ("Via", via_selecionada), ("Ano", int(ano_via))]
+                ).sort_values("Valor_FOB", ascending=False)
                 
-                if not df_composicao.empty:
-                    composicao_produtos = (
-                        df_composicao.groupby(["SH4", "Descricao"], as_index=False)
-                        [["Valor_FOB", "Quilo_Liquido"]].sum()
-                        .sort_values("Valor_FOB", ascending=False)
-                    )
+                if not composicao_produtos.empty:
                     
                     # Tabela produtos com FOB e Quantidade (fora das colunas)
                     composicao_produtos["Valor FOB ($)"] = composicao_produtos["Valor_FOB"].apply(formatar_moeda)
@@ -588,7 +678,7 @@ elif pagina == "📈 Evolução Temporal":
     # ========== ANÁLISE TEMPORAL GERAL ==========
     st.subheader("🌍 Evolução do Comércio Exterior Brasileiro")
     
-    evolucao_geral = df_final.groupby(["Ano", "Tipo"], as_index=False)["Valor_FOB"].sum()
+    evolucao_geral = agregar(["Ano", "Tipo"], ["Valor_FOB"])
     
     col1, col2 = st.columns(2)
     
@@ -614,9 +704,7 @@ elif pagina == "📈 Evolução Temporal":
     # ========== EVOLUÇÃO POR PRODUTO ==========
     st.subheader("📦 Evolução por Produto")
     
-    evolucao_produtos = (
-        df_final.groupby(["SH4", "Descricao", "Ano", "Tipo"], as_index=False)["Valor_FOB"].sum()
-    )
+    evolucao_produtos = agregar(["SH4", "Descricao", "Ano", "Tipo"], ["Valor_FOB"])
     
     # Seletores
     col1, col2 = st.columns(2)